@@ -0,0 +1,43 @@
+import glob
+import multiprocessing
+
+import yaml
+
+from stl_rules.comfort_jerk import ComfortLongitudinalJerk, ComfortLateralJerk
+from stl_rules.tr_left_turn import TrafficRuleLeftTurn
+from stl_rules.shared_episode import SharedEpisode
+from stl_rules.utils import monitor_trace
+
+# map from table prefix to rule
+stl_rules = {
+    "legal_turn": TrafficRuleLeftTurn,
+    "comfort_lon": ComfortLongitudinalJerk,
+    "comfort_lat": ComfortLateralJerk
+}
+
+
+def monitor_table(handle, table_name, rule_name, rss_params):
+    # attach to the episode in shared memory, no csv is read in the worker
+    with SharedEpisode.attach(handle) as episode:
+        trace = episode.table(table_name)
+        rule = stl_rules[rule_name](rss_params=rss_params)
+        signals = rule.generate_signals_for_demo(trace)
+        robustness = [r for t, r in monitor_trace(rule.demo_spec, rule.variables, rule.types, signals)]
+        del trace   # views must be released before closing the shared block
+    return table_name, min(robustness)
+
+
+if __name__ == "__main__":
+    # load data
+    with open("../data/rss_params.yaml", 'r') as stream:
+        rss_params = yaml.safe_load(stream)
+    filepaths = sorted(glob.glob("../data/sim_data/episode_1/*.csv"))
+
+    # load the episode once in shared memory, then evaluate each table in parallel
+    with SharedEpisode.from_csv(filepaths) as episode:
+        print(f"shared episode: {len(episode.tables)} tables in {episode.nbytes} bytes")
+        jobs = [(episode.handle, table, rule_name, rss_params)
+                for table in episode.tables for rule_name in stl_rules if table.startswith(rule_name)]
+        with multiprocessing.Pool(4) as pool:
+            for table, min_robustness in pool.starmap(monitor_table, jobs):
+                print(f"{table}: min robustness {min_robustness:.3f}")
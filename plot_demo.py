@@ -1,8 +1,11 @@
 import argparse
-import glob
+import multiprocessing
+import os
 import pathlib
+import signal
 import time
 
+import numpy as np
 import pandas as pd
 import yaml
 import matplotlib.pyplot as plt
@@ -11,6 +14,11 @@ from stl_rules.rss_lat_safety import RSSLateralSafetyRule
 from stl_rules.rss_lon_safety import RSSLongitudinalSafetyRule
 from stl_rules.tr_left_turn import TrafficRuleLeftTurn
 from stl_rules.comfort_jerk import ComfortLateralJerk, ComfortLongitudinalJerk
+from stl_rules.catalog import Catalog, file_snapshot
+from stl_rules.fleet_stats import FleetStats
+from stl_rules.plotting import downsamplers, bin_min, robustness_envelope, draw_robustness, render_robustness_plot
+from stl_rules.spec_analysis import SpecAnalysis
+from stl_rules.results_store import ResultsReader, ResultsWriter, params_hash
 from stl_rules.utils import monitor_trace
 
 # map from stl-rule name to implementation class
@@ -29,67 +37,201 @@ rules_titles = {
     "comfort_lat": "Comfort Metric, Lateral Jerk"
 }
 
-parser = argparse.ArgumentParser()
-parser.add_argument("--rules", type=str, nargs="+", help="rules to monitor", choices=stl_rules.keys())
-parser.add_argument("--datadir", type=pathlib.Path, help="where csv logs are stored", required=True)
-parser.add_argument("--begin", type=int, help="index of trace begin", default=10)
-parser.add_argument("--end", type=int, help="index of trace end", default=1000)
-parser.add_argument("-no_save", action="store_true")
-args = parser.parse_args()
-
-rules = args.rules
-datadir = args.datadir
-begin, end = args.begin, args.end
-disable_save = args.no_save
-assert datadir.exists(), f"datadir {datadir} not exists"
-assert begin <= end, f"not valid trace delimiters ({begin} > {end}"
-
-# load params
-with open("data/rss_params.yaml", 'r') as stream:
-    rss_params = yaml.safe_load(stream)
-
-# monitor rules
-for rule_name in rules:
+
+def monitor_rule(rule_name: str) -> int:
     # create stl-rule
     rule = stl_rules[rule_name](rss_params=rss_params)
-    stl_spec = rule.spec
+    rule_params = params_hash(rule.params)
+    # logs are in datadir or in its episode sub-directories
+    filepaths = sorted(datadir.glob(f"{rule_name}*csv")) + sorted(datadir.glob(f"*/{rule_name}*csv"))
+    if catalog is not None:
+        filepaths = catalog.pending(filepaths, rule_name, rule_params,
+                                    min_age=args.settle_sec if args.watch is not None else 0.0)
+        filepaths = [f for f in filepaths if not is_buffered(f, rule_name, rule_params)]
+        if len(filepaths) == 0:
+            return 0
     #
     rule_t0 = time.time()
-    xs, ys, labels = [], [], []
-    print(f"[Info] Monitoring rule {rule_name} from files in {datadir}")
-    for filepath_str in glob.glob(str(datadir / f"{rule_name}*csv")):
+    curves, binned = [], []
+    print(f"[Info] Monitoring rule {rule_name} from {len(filepaths)} files in {datadir}")
+    analysis = SpecAnalysis(rule.demo_spec)
+    print(f"[Info] horizon: past {analysis.past_horizon}, future {analysis.future_horizon} steps, "
+          f"buffer size: {analysis.buffer_size} samples")
+    for filepath in filepaths:
         file_t0 = time.time()
         # read data
-        filepath = pathlib.Path(filepath_str)
+        snapshot = file_snapshot(filepath) if catalog is not None else None
         trace = pd.read_csv(filepath)
         print(f"\tfile: {filepath}")
         print(f"\tload data: {len(trace)} rows in {time.time() - file_t0:.3f} sec")
         # monitoring
         signals = rule.generate_signals_for_demo(trace, begin=begin, end=end)
         robustness = [r for t, r in monitor_trace(rule.demo_spec, rule.variables, rule.types, signals)]
-        print(f"\tmonitoring trace in {time.time() - file_t0:.3f} sec")
-        # write results
-        outpath = str(datadir / f"robustness_{filepath.stem}_{int(time.time())}.csv")
-        out = pd.DataFrame({"elapsed_time": signals["elapsed_time"], "robustness": robustness})
+        monitoring_time = time.time() - file_t0
+        print(f"\tmonitoring trace in {monitoring_time:.3f} sec "
+              f"(estimated cost: {analysis.estimated_cost(len(robustness)):.3g} ops for {len(robustness)} steps)")
+        # write results, file names are `<rule>_<actor>_<actor>.csv` in the episode directory
+        # note: stats are updated before appending, the append may flush the batch and save them
+        if (str(filepath.resolve()), rule_name, rule_params) in counted:
+            recounted.add((str(filepath.resolve()), rule_name, rule_params))
+        counted.add((str(filepath.resolve()), rule_name, rule_params))
+        fleet_stats.update(rule_name, rule_params, signals["elapsed_time"], robustness)
         if not disable_save:
-            out.to_csv(outpath, index=False)
-        print(f"\tresults written in {outpath}")
-        # collect curves for aggregated plot
-        xs.append(signals['elapsed_time'])
-        ys.append(robustness)
-        labels.append(str(filepath.stem))
+            input_info = {}
+            if catalog is not None:
+                # the input snapshot goes with the result, to record it in the catalog when flushed
+                buffered[(snapshot["path"], rule_name, rule_params)] = snapshot
+                input_info = {"input": snapshot}
+                previous = catalog.latest(filepath, rule_name, rule_params)
+                if previous is not None:
+                    input_info["supersedes"] = previous["result"]
+            own_results.add(results_writer.append(signals["elapsed_time"], robustness, rule=rule_name,
+                                                  params=rule_params, episode=filepath.parent.name,
+                                                  actors=filepath.stem[len(rule_name) + 1:],
+                                                  file=str(filepath.resolve()), begin=begin, end=end,
+                                                  monitoring_time=monitoring_time, **input_info))
+            print(f"\tresults appended to {outdir}")
+        # keep only the reduced curves for the plot, not the full traces
+        xx, yy = np.asarray(signals["elapsed_time"], dtype=float), np.asarray(robustness, dtype=float)
+        if plot_mode in ["lines", "both"]:
+            curves.append((*downsample(xx, yy, max_points), str(filepath.stem)))
+        if plot_mode in ["envelope", "both"]:
+            binned.append(bin_min(xx, yy, bin_sec))
     # plot
-    plt.clf()
-    plt.title(rules_titles[rule_name])
-    plt.xlabel("time (sec)")
-    plt.ylabel("robustness")
-    for xx, yy, label in zip(xs, ys, labels):
-        plt.plot(xx, yy, label=label)
-    plt.legend()
-    if disable_save:
+    plot_kwargs = {"curves": curves}
+    if len(binned) > 0:
+        envelope = robustness_envelope(binned)
+        plot_kwargs["envelope"] = envelope
+        plot_kwargs["bin_centers"] = (np.arange(len(envelope["min"])) + 0.5) * bin_sec
+    if plot_mode == "none":
+        pass
+    elif disable_save:
+        plt.clf()
+        draw_robustness(plt.gca(), rules_titles[rule_name], **plot_kwargs)
         plt.show()
     else:
-        plt.savefig(datadir / f"plot_robustness_{rule_name}_{time.time()}.png")
+        plotpath = str(datadir / f"plot_robustness_{rule_name}_{time.time()}.png")
+        plot_jobs.append(plot_pool.apply_async(render_robustness_plot, (plotpath, rules_titles[rule_name]),
+                                               plot_kwargs))
     print(f"[Result] monitoring rule in {time.time() - rule_t0:.3f} sec")
     print()
+    return len(filepaths)
+
+
+def is_buffered(filepath: pathlib.Path, rule_name: str, rule_params: str) -> bool:
+    # already monitored in this run, results not flushed yet (so not in the catalog)
+    snapshot = buffered.get((str(filepath.resolve()), rule_name, rule_params))
+    stat = filepath.stat()
+    return snapshot is not None and (snapshot["size"], snapshot["mtime_ns"]) == (stat.st_size, stat.st_mtime_ns)
+
+
+def on_results_flushed(entries):
+    # record the processed files, only once their results are in the store
+    for entry in entries:
+        if "input" in entry:
+            catalog.record(entry["input"], entry["rule"], entry["params"], result=entry["id"])
+            key = (entry["input"]["path"], entry["rule"], entry["params"])
+            if buffered.get(key) == entry["input"]:
+                del buffered[key]
+    save_fleet_stats()
+
+
+def save_fleet_stats():
+    # fleet statistics of this run, files from several runs can be merged with `FleetStats.load_and_merge`
+    # unless a file has been monitored again in a later run (e.g. modified), then rebuild them from the store
+    global fleet_stats
+    if len(recounted) > 0 and results_writer is not None:
+        # files monitored again in this run (e.g. modified while watching) count once, with their latest results,
+        # called once the results are flushed, so that they are all in the store
+        fleet_stats = FleetStats()
+        fleet_stats.update_from_store(ResultsReader(outdir), id=own_results)
+        recounted.clear()
+    for key, summary in fleet_stats.summary().items():
+        print(f"[Result] {key}: {summary['episodes']} episodes, violation rate {summary['violation_rate']:.3f}, "
+              f"min robustness {summary['min']:.3f}")
+    # nothing is written when no file has been monitored (e.g. incremental run with no new logs)
+    if results_writer is not None and len(fleet_stats.keys()) > 0:
+        fleet_stats.save(fleet_stats_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rules", type=str, nargs="+", help="rules to monitor", choices=stl_rules.keys())
+    parser.add_argument("--datadir", type=pathlib.Path, help="where csv logs are stored", required=True)
+    parser.add_argument("--begin", type=int, help="index of trace begin", default=10)
+    parser.add_argument("--end", type=int, help="index of trace end", default=1000)
+    parser.add_argument("--plot", type=str, help="one line per file, aggregated envelope across files, both or none",
+                        choices=["lines", "envelope", "both", "none"], default="lines")
+    parser.add_argument("--max_points", type=int, help="max points per plotted curve", default=1000)
+    parser.add_argument("--downsampling", type=str, help="shape-preserving downsampling method",
+                        choices=downsamplers.keys(), default="lttb")
+    parser.add_argument("--bin_sec", type=float, help="time-bin width for the aggregated envelope (sec)", default=0.5)
+    parser.add_argument("--plot_workers", type=int, help="num of processes rendering plots in background", default=1)
+    parser.add_argument("--outdir", type=pathlib.Path, help="results store (default: <datadir>/robustness_store)")
+    parser.add_argument("--incremental", action="store_true", help="monitor only new or modified files (see catalog)")
+    parser.add_argument("--watch", type=float, help="keep monitoring new files, polling datadir every WATCH sec")
+    parser.add_argument("--settle_sec", type=float, help="in watch mode, skip files modified in the last sec",
+                        default=2.0)
+    parser.add_argument("--flush_sec", type=float, help="in watch mode, max delay before writing results to the store",
+                        default=60.0)
+    parser.add_argument("-no_save", action="store_true")
+    args = parser.parse_args()
+
+    rules = args.rules
+    datadir = args.datadir
+    begin, end = args.begin, args.end
+    disable_save = args.no_save
+    outdir = args.outdir if args.outdir is not None else datadir / "robustness_store"
+    plot_mode, max_points, bin_sec = args.plot, args.max_points, args.bin_sec
+    downsample = downsamplers[args.downsampling]
+    assert datadir.exists(), f"datadir {datadir} not exists"
+    assert begin <= end, f"not valid trace delimiters ({begin} > {end}"
+    incremental = args.incremental or args.watch is not None
+    assert not (incremental and disable_save), "incremental and watch modes need to save the results"
+
+    # load params
+    with open("data/rss_params.yaml", 'r') as stream:
+        rss_params = yaml.safe_load(stream)
+
+    # plots are rendered headless in background processes, while monitoring the next rules
+    # workers ignore ctrl-c, so that the pending plots are completed when the watch mode is interrupted
+    plot_pool = multiprocessing.Pool(args.plot_workers, initializer=signal.signal,
+                                     initargs=(signal.SIGINT, signal.SIG_IGN)) \
+        if not disable_save and plot_mode != "none" else None
+    plot_jobs = []
+
+    # results of all the rules are appended to the same store, in batches across rules and polls:
+    # files are recorded in the catalog and fleet stats saved when a batch is flushed
+    results_writer = ResultsWriter(outdir, max_delay=args.flush_sec if args.watch is not None else None,
+                                   on_flush=on_results_flushed) if not disable_save else None
+    buffered = {}
+    fleet_stats = FleetStats()
+    # files counted in the fleet stats, files counted more than once and results written by this run
+    counted, recounted, own_results = set(), set(), set()
+    fleet_stats_path = outdir / f"fleet_stats_{int(time.time())}_{os.getpid()}.json"
+    # catalog of processed files, shared by all the runs writing in the same store
+    catalog = Catalog(outdir / "catalog.jsonl") if incremental else None
+
+    # monitor rules, in watch mode repeat until interrupted
+    try:
+        while True:
+            for rule_name in rules:
+                monitor_rule(rule_name)
+            if args.watch is None:
+                break
+            results_writer.flush_if_due()
+            time.sleep(args.watch)
+    except KeyboardInterrupt:
+        print("[Info] Watch interrupted")
+    # write the last batch
+    if results_writer is not None:
+        results_writer.close()
+    else:
+        save_fleet_stats()
 
+    # wait for background rendering
+    if plot_pool is not None:
+        for job in plot_jobs:
+            print(f"[Result] plot written in {job.get()}")
+        plot_pool.close()
+        plot_pool.join()
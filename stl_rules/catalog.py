@@ -0,0 +1,109 @@
+import hashlib
+import json
+import os
+import pathlib
+import time
+import warnings
+from typing import Any, Dict, List, Optional, Tuple
+
+
+def file_snapshot(filepath: pathlib.Path) -> Dict[str, Any]:
+    """ Path, size, modification time and content hash of a file, to be taken before reading it."""
+    filepath = pathlib.Path(filepath).resolve()
+    stat = filepath.stat()
+    sha1 = hashlib.sha1()
+    with open(filepath, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            sha1.update(chunk)
+    return {"path": str(filepath), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "hash": sha1.hexdigest()}
+
+
+class Catalog:
+    """
+    Append-only catalog of the processed input files, stored as json lines.
+
+    Each entry records path, size, mtime and content hash of an input file, the rule and params hash it has been
+    monitored with and the id of its results in the store. The latest entry of a (path, rule, params) wins,
+    and records the results it `supersedes`.
+    A file is considered already processed if its size and mtime did not change or, when only the mtime changed,
+    if its content hash is the same.
+    Loading never modifies the file, which can be shared by concurrent runs: a last line still being appended is
+    ignored, and a record torn by a killed process is skipped (with a warning); the next record starts on a new line.
+    """
+
+    def __init__(self, path: pathlib.Path):
+        self._path = pathlib.Path(path)
+        self._entries: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+        if self._path.exists():
+            with open(self._path, "rb") as f:
+                lines = f.readlines()
+            for i, line in enumerate(lines):
+                last = i == len(lines) - 1
+                if not line.strip() or (last and not line.endswith(b"\n")):
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # a record is torn if the process was killed while appending it, other corruptions raise
+                    if not (last or self._torn(line)):
+                        raise
+                    warnings.warn(f"skipping incomplete line {i + 1} of catalog {self._path}: {line[:80]!r}")
+                    continue
+                self._entries[(entry["path"], entry["rule"], entry["params"])] = entry
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def latest(self, filepath: pathlib.Path, rule: str, params: str) -> Optional[Dict[str, Any]]:
+        """ Latest entry of the file processed with the given rule and params, None if never processed."""
+        return self._entries.get((str(pathlib.Path(filepath).resolve()), rule, params))
+
+    def is_processed(self, filepath: pathlib.Path, rule: str, params: str) -> bool:
+        filepath = pathlib.Path(filepath).resolve()
+        entry = self._entries.get((str(filepath), rule, params))
+        if entry is None:
+            return False
+        stat = filepath.stat()
+        if stat.st_size != entry["size"]:
+            return False
+        if stat.st_mtime_ns == entry["mtime_ns"]:
+            return True
+        return file_snapshot(filepath)["hash"] == entry["hash"]
+
+    def pending(self, filepaths: List[pathlib.Path], rule: str, params: str, min_age: float = 0.0) -> List[
+        pathlib.Path]:
+        """
+        :param filepaths: candidate input files
+        :param rule, params: rule name and params hash the files would be monitored with
+        :param min_age: skip files modified less than `min_age` seconds ago (e.g. still being written)
+        :return: new or modified files, not processed yet with the given rule and params
+        """
+        now = time.time()
+        return [f for f in filepaths
+                if now - os.path.getmtime(f) >= min_age and not self.is_processed(f, rule, params)]
+
+    def record(self, snapshot: Dict[str, Any], rule: str, params: str, result: str):
+        """
+        :param snapshot: `file_snapshot` of the input file, taken before reading it
+        :param rule, params: rule name and params hash it has been monitored with
+        :param result: id of the results in the store (see `ResultsWriter.append`)
+        """
+        entry = {**snapshot, "rule": rule, "params": params, "result": result, "processed": time.time()}
+        previous = self._entries.get((entry["path"], rule, params))
+        if previous is not None:
+            entry["supersedes"] = previous["result"]
+        with open(self._path, "ab") as f:
+            # start on a new line if the last record has been torn
+            newline = f.tell() > 0 and not self._ends_with_newline()
+            f.write(("\n" if newline else "").encode() + (json.dumps(entry) + "\n").encode())
+        self._entries[(entry["path"], rule, params)] = entry
+
+    def _ends_with_newline(self) -> bool:
+        with open(self._path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+
+    @staticmethod
+    def _torn(line: bytes) -> bool:
+        """ Records are flat json objects, a line not closing its object has been cut while appending."""
+        return not line.rstrip().endswith(b"}")
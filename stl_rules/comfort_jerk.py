@@ -40,6 +40,11 @@ class ComfortLongitudinalJerk(STLRule):
     def demo_spec(self):
         return self.spec
 
+    @property
+    def signals_radius(self) -> int:
+        # jerk is computed with central differences
+        return 1
+
     def generate_signals_for_demo(self, data: Dict[str, np.ndarray], begin: int = 5, end: int = 1000) -> Dict[str, list]:
         # check input
         obs_signals = ["elapsed_time", "j_lon"]
@@ -107,6 +112,11 @@ class ComfortLateralJerk(STLRule):
     def demo_spec(self):
         return self.spec
 
+    @property
+    def signals_radius(self) -> int:
+        # jerk is computed with central differences
+        return 1
+
     def generate_signals_for_demo(self, data: Dict[str, np.ndarray], begin: int = 5, end: int = 1000) -> Dict[
         str, List]:
         # check input
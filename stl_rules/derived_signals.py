@@ -0,0 +1,204 @@
+from typing import Any, Callable, Dict, List, Mapping, Tuple
+
+import numpy as np
+
+
+class DerivedSignal:
+    """
+    Node of the derived-signal graph.
+
+    A node computes one signal from some observed signals (`signals`, formal names bound to data columns when the
+    node is requested), the outputs of other nodes (`deps`) and static parameters (`params`).
+    The `compute` function writes the result in-place into a preallocated `out` buffer.
+    """
+
+    def __init__(self, name: str, signals: List[str], params: List[str], compute: Callable,
+                 deps: Dict[str, Tuple[str, List[str]]] = None):
+        """
+        :param name: name of the derived signal
+        :param signals: formal names of the observed signals used by the node (e.g. `v` for a velocity)
+        :param params: names of the static parameters used by `compute`
+        :param compute: function `compute(out, p, **arrays)`, where `arrays` contains the observed signals
+            (by formal name) and the dep outputs (by dep key)
+        :param deps: map from key to (node name, formal signals of this node bound to the dep signals, in order)
+        """
+        self.name = name
+        self.signals = signals
+        self.params = params
+        self.compute = compute
+        self.deps = deps if deps is not None else {}
+        # parameters the node value depends on, including the ones of its deps
+        self.all_params = sorted(set(params).union(*[derived_signals[d].all_params for d, _ in self.deps.values()]))
+
+
+# registry of derived signals, from name to node
+derived_signals: Dict[str, DerivedSignal] = {}
+
+
+def derived_signal(name: str, signals: List[str], params: List[str], deps: Dict[str, Tuple[str, List[str]]] = None):
+    """ Decorator to register a compute function as derived-signal node."""
+
+    def register(compute: Callable) -> Callable:
+        assert name not in derived_signals, f"derived signal {name} already registered"
+        for dep_name, dep_signals in (deps or {}).values():
+            assert dep_name in derived_signals, f"unknown dependency {dep_name} of {name}"
+            assert all([s in signals for s in dep_signals]), f"dependency {dep_name} uses signals not in {signals}"
+        derived_signals[name] = DerivedSignal(name, signals, params, compute, deps)
+        return compute
+
+    return register
+
+
+class SignalGraph(Mapping):
+    """
+    Derived signals of one trace, computed on demand and memoized.
+
+    It wraps the trace data (dict or dataframe) and can be passed in place of it to the rules `generate_signals`:
+    the derived signals requested by several rules with the same observed signals and parameters are computed once.
+    Returned arrays are read-only views of the graph buffers.
+    """
+
+    def __init__(self, data: Mapping[str, Any]):
+        self._data = data
+        self._inputs: Dict[str, np.ndarray] = {}
+        self._memo: Dict[Tuple, np.ndarray] = {}
+
+    def __getitem__(self, key: str) -> np.ndarray:
+        return np.asarray(self._data[key])
+
+    def __contains__(self, key) -> bool:
+        return key in self._data
+
+    def __iter__(self):
+        return iter(self._data.keys())
+
+    def __len__(self) -> int:
+        return len(self._data.keys())
+
+    def get_derived(self, name: str, params: Dict[str, Any], **bindings: str) -> np.ndarray:
+        """
+        :param name: name of the derived signal
+        :param params: static parameters (only the ones used by the node are considered)
+        :param bindings: map from formal signal names of the node to data columns, e.g. `v="v_lon_ego"`
+        :return: the derived signal
+        """
+        node = derived_signals[name]
+        assert all([s in bindings for s in node.signals]), f"missing bindings ({node.signals} not in {bindings})"
+        assert all([p in params for p in node.all_params]), f"missing params ({node.all_params} not in {params.keys()})"
+        key = (name, tuple(bindings[s] for s in node.signals), tuple(params[p] for p in node.all_params))
+        if key not in self._memo:
+            arrays = {s: self._input(bindings[s]) for s in node.signals}
+            for dep_key, (dep_name, dep_signals) in node.deps.items():
+                dep_bindings = {formal: bindings[s] for formal, s in zip(derived_signals[dep_name].signals, dep_signals)}
+                arrays[dep_key] = self.get_derived(dep_name, params, **dep_bindings)
+            out = np.empty(len(self._input(bindings[node.signals[0]])))
+            node.compute(out, {p: params[p] for p in node.params}, **arrays)
+            out.flags.writeable = False
+            self._memo[key] = out
+        return self._memo[key]
+
+    def _input(self, column: str) -> np.ndarray:
+        if column not in self._inputs:
+            assert column in self._data, f"missing signal {column}"
+            self._inputs[column] = np.asarray(self._data[column], dtype=float)
+        return self._inputs[column]
+
+
+def as_signal_graph(data: Mapping[str, Any]) -> SignalGraph:
+    """ Return `data` if it is already a signal graph, otherwise wrap it in a new one."""
+    return data if isinstance(data, SignalGraph) else SignalGraph(data)
+
+
+# Longitudinal distances, RSS [2: Shalev-Shwartz et al., 2018]
+@derived_signal("lon_prebrake_dist", signals=["v"], params=["rho", "a_lon_maxacc"])
+def _lon_prebrake_dist(out, p, v):
+    """ distance travelled during the reaction time, accelerating at max: v*rho + 1/2*a_maxacc*rho^2"""
+    np.multiply(v, p['rho'], out=out)
+    out += 1 / 2 * p['a_lon_maxacc'] * p['rho'] ** 2
+
+
+@derived_signal("lon_brake_dist", signals=["v"], params=["rho", "a_lon_maxacc", "a_lon_minbr"])
+def _lon_brake_dist(out, p, v):
+    """ distance to stop braking at min, after reaction time: (v + rho*a_maxacc)^2 / (2*a_minbr)"""
+    np.add(v, p['rho'] * p['a_lon_maxacc'], out=out)
+    np.square(out, out=out)
+    out /= 2 * p['a_lon_minbr']
+
+
+@derived_signal("lon_stop_dist", signals=["v"], params=["a_lon_maxbr"])
+def _lon_stop_dist(out, p, v):
+    """ distance to stop braking at max, without reaction time: v^2 / (2*a_maxbr)"""
+    np.square(v, out=out)
+    out /= 2 * p['a_lon_maxbr']
+
+
+@derived_signal("lon_safe_dist_static", signals=["v"], params=[],
+                deps={"prebr": ("lon_prebrake_dist", ["v"]), "brake": ("lon_brake_dist", ["v"])})
+def _lon_safe_dist_static(out, p, v, prebr, brake):
+    """ safe longitudinal distance w.r.t. a stationary object (e.g. a junction)"""
+    np.add(prebr, brake, out=out)
+    np.maximum(out, 0.0, out=out)
+
+
+@derived_signal("lon_safe_dist", signals=["v_b", "v_f"], params=[],
+                deps={"prebr": ("lon_prebrake_dist", ["v_b"]), "brake": ("lon_brake_dist", ["v_b"]),
+                      "stop_f": ("lon_stop_dist", ["v_f"])})
+def _lon_safe_dist(out, p, v_b, v_f, prebr, brake, stop_f):
+    """ safe longitudinal distance between a back and a front vehicle, Def. 1 in [2]"""
+    np.add(prebr, brake, out=out)
+    out -= stop_f
+    np.maximum(out, 0.0, out=out)
+
+
+# Lateral distances, Def. 3.2 in [1: Hekmatnejad et al., MEMOCODE 2019]
+@derived_signal("lat_v_rho_l", signals=["v"], params=["rho", "a_lat_maxacc"])
+def _lat_v_rho_l(out, p, v):
+    """ lateral velocity of left vehicle after reaction time, accelerating towards right at max"""
+    np.add(v, p["rho"] * p["a_lat_maxacc"], out=out)
+
+
+@derived_signal("lat_v_rho_r", signals=["v"], params=["rho", "a_lat_maxacc"])
+def _lat_v_rho_r(out, p, v):
+    """ lateral velocity of right vehicle after reaction time, accelerating towards left at max"""
+    np.subtract(v, p["rho"] * p["a_lat_maxacc"], out=out)
+
+
+def _lat_prebrake_dist(out, p, v, v_rho):
+    """ distance travelled during the reaction time: (v + v_rho)/2 * rho"""
+    np.add(v, v_rho, out=out)
+    out /= 2
+    out *= p["rho"]
+
+
+def _lat_brake_dist(out, p, v, v_rho):
+    """ distance to stop braking at min, after reaction time: v_rho^2 / (2*a_minbr)"""
+    np.square(v_rho, out=out)
+    out /= 2 * p["a_lat_minbr"]
+
+
+derived_signal("lat_prebrake_dist_l", signals=["v"], params=["rho"],
+               deps={"v_rho": ("lat_v_rho_l", ["v"])})(_lat_prebrake_dist)
+derived_signal("lat_prebrake_dist_r", signals=["v"], params=["rho"],
+               deps={"v_rho": ("lat_v_rho_r", ["v"])})(_lat_prebrake_dist)
+derived_signal("lat_brake_dist_l", signals=["v"], params=["a_lat_minbr"],
+               deps={"v_rho": ("lat_v_rho_l", ["v"])})(_lat_brake_dist)
+derived_signal("lat_brake_dist_r", signals=["v"], params=["a_lat_minbr"],
+               deps={"v_rho": ("lat_v_rho_r", ["v"])})(_lat_brake_dist)
+
+
+@derived_signal("lat_dist_r", signals=["v"], params=[],
+                deps={"prebr": ("lat_prebrake_dist_r", ["v"]), "brake": ("lat_brake_dist_r", ["v"])})
+def _lat_dist_r(out, p, v, prebr, brake):
+    """ lateral displacement of the right vehicle: d_r_prebr - d_r_brake"""
+    np.subtract(prebr, brake, out=out)
+
+
+@derived_signal("lat_safe_dist", signals=["v_l", "v_r"], params=["mu"],
+                deps={"prebr_l": ("lat_prebrake_dist_l", ["v_l"]), "brake_l": ("lat_brake_dist_l", ["v_l"]),
+                      "dist_r": ("lat_dist_r", ["v_r"])})
+def _lat_safe_dist(out, p, v_l, v_r, prebr_l, brake_l, dist_r):
+    """ safe lateral distance between a left and a right vehicle: mu + max(0, d_l_prebr + d_l_brake - d_r)"""
+    np.add(prebr_l, brake_l, out=out)
+    out -= dist_r
+    np.maximum(out, 0.0, out=out)
+    out += p["mu"]
@@ -0,0 +1,265 @@
+import json
+import math
+import pathlib
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+
+class QuantileSketch:
+    """
+    Mergeable quantile sketch with relative accuracy `alpha`, as in DDSketch [Masson et al., VLDB 2019].
+
+    Values are counted in logarithmic buckets (one store for positive, one for negative values), so memory depends
+    only on the range of magnitudes, not on the number of values. Any returned quantile `x_q` satisfies
+    |x_q - x| <= alpha * |x| w.r.t. the exact quantile `x`. Values with magnitude below `min_value` count as zero.
+    """
+
+    def __init__(self, alpha: float = 0.01, min_value: float = 1e-9):
+        assert 0 < alpha < 1, f"not valid relative accuracy ({alpha})"
+        self.alpha = alpha
+        self.min_value = min_value
+        self._gamma = (1 + alpha) / (1 - alpha)
+        self._log_gamma = math.log(self._gamma)
+        self._pos: Dict[int, int] = {}
+        self._neg: Dict[int, int] = {}
+        self._zero = 0
+        self._pos_inf = 0
+        self._neg_inf = 0
+
+    @property
+    def count(self) -> int:
+        return sum(self._pos.values()) + sum(self._neg.values()) + self._zero + self._pos_inf + self._neg_inf
+
+    def update(self, values: np.ndarray):
+        values = np.asarray(values, dtype=float).ravel()
+        values = values[~np.isnan(values)]
+        self._pos_inf += int(np.sum(values == np.inf))
+        self._neg_inf += int(np.sum(values == -np.inf))
+        values = values[np.isfinite(values)]
+        self._zero += int(np.sum(np.abs(values) < self.min_value))
+        for store, magnitudes in [(self._pos, values[values >= self.min_value]),
+                                  (self._neg, -values[values <= -self.min_value])]:
+            indices, counts = np.unique(np.ceil(np.log(magnitudes) / self._log_gamma).astype(int), return_counts=True)
+            for i, c in zip(indices.tolist(), counts.tolist()):
+                store[i] = store.get(i, 0) + c
+
+    def merge(self, other: "QuantileSketch"):
+        assert (self.alpha, self.min_value) == (other.alpha, other.min_value), "cannot merge sketches with different accuracy"
+        for store, other_store in [(self._pos, other._pos), (self._neg, other._neg)]:
+            for i, c in other_store.items():
+                store[i] = store.get(i, 0) + c
+        self._zero += other._zero
+        self._pos_inf += other._pos_inf
+        self._neg_inf += other._neg_inf
+
+    def quantile(self, q: float) -> float:
+        assert 0 <= q <= 1, f"not valid quantile ({q})"
+        count = self.count
+        if count == 0:
+            return math.nan
+        rank = q * (count - 1)
+        # walk the buckets in increasing value order
+        buckets = [(-math.inf, self._neg_inf)]
+        buckets += [(-self._value(i), self._neg[i]) for i in sorted(self._neg, reverse=True)]
+        buckets += [(0.0, self._zero)]
+        buckets += [(self._value(i), self._pos[i]) for i in sorted(self._pos)]
+        buckets += [(math.inf, self._pos_inf)]
+        seen = 0
+        for value, c in buckets:
+            seen += c
+            if seen > rank:
+                return value
+        return math.inf
+
+    def _value(self, index: int) -> float:
+        return 2 * self._gamma ** index / (self._gamma + 1)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"alpha": self.alpha, "min_value": self.min_value, "zero": self._zero, "pos_inf": self._pos_inf,
+                "neg_inf": self._neg_inf, "pos": {str(i): c for i, c in self._pos.items()},
+                "neg": {str(i): c for i, c in self._neg.items()}}
+
+    @staticmethod
+    def from_dict(d: Dict[str, Any]) -> "QuantileSketch":
+        sketch = QuantileSketch(alpha=d["alpha"], min_value=d["min_value"])
+        sketch._zero, sketch._pos_inf, sketch._neg_inf = d["zero"], d["pos_inf"], d["neg_inf"]
+        sketch._pos = {int(i): c for i, c in d["pos"].items()}
+        sketch._neg = {int(i): c for i, c in d["neg"].items()}
+        return sketch
+
+
+class Histogram:
+    """ Mergeable histogram with fixed bin edges, values outside the edges are counted in under/overflow."""
+
+    def __init__(self, edges: Sequence[float]):
+        self.edges = np.asarray(edges, dtype=float)
+        assert len(self.edges) >= 2 and np.all(np.diff(self.edges) > 0), "bin edges must be increasing"
+        self.counts = np.zeros(len(self.edges) - 1, dtype=np.int64)
+        self.underflow, self.overflow = 0, 0
+
+    def update(self, values: np.ndarray):
+        values = np.asarray(values, dtype=float).ravel()
+        values = values[~np.isnan(values)]
+        self.underflow += int(np.sum(values < self.edges[0]))
+        self.overflow += int(np.sum(values > self.edges[-1]))
+        self.counts += np.histogram(values, bins=self.edges)[0]
+
+    def merge(self, other: "Histogram"):
+        assert np.array_equal(self.edges, other.edges), "cannot merge histograms with different edges"
+        self.counts += other.counts
+        self.underflow += other.underflow
+        self.overflow += other.overflow
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"edges": self.edges.tolist(), "counts": self.counts.tolist(),
+                "underflow": self.underflow, "overflow": self.overflow}
+
+    @staticmethod
+    def from_dict(d: Dict[str, Any]) -> "Histogram":
+        hist = Histogram(d["edges"])
+        hist.counts = np.asarray(d["counts"], dtype=np.int64)
+        hist.underflow, hist.overflow = d["underflow"], d["overflow"]
+        return hist
+
+
+# default bins for the robustness histogram: symmetric, log-spaced magnitudes
+default_histogram_edges = sorted({0.0, *np.logspace(-3, 3, 25).tolist(), *(-np.logspace(-3, 3, 25)).tolist()})
+
+
+class RuleStats:
+    """
+    Streaming statistics of the robustness of one rule (and parameter set) across episodes.
+
+    Per sample: count, violations (robustness < 0), min/max, quantile sketch and histogram of robustness.
+    Per episode: count, violating episodes, quantile sketches of min robustness and time-to-violation.
+    """
+
+    def __init__(self, alpha: float = 0.01, histogram_edges: Sequence[float] = None):
+        edges = histogram_edges if histogram_edges is not None else default_histogram_edges
+        self.n_samples, self.n_violating_samples = 0, 0
+        self.n_episodes, self.n_violating_episodes = 0, 0
+        self.min, self.max = math.inf, -math.inf
+        self.robustness = QuantileSketch(alpha)
+        self.robustness_hist = Histogram(edges)
+        self.episode_min = QuantileSketch(alpha)
+        self.time_to_violation = QuantileSketch(alpha)
+
+    def update(self, elapsed_time: np.ndarray, robustness: np.ndarray):
+        """ Add one episode, `elapsed_time` is used to compute the time-to-violation from the episode begin."""
+        elapsed_time = np.asarray(elapsed_time, dtype=float)
+        robustness = np.asarray(robustness, dtype=float)
+        assert elapsed_time.shape == robustness.shape, f"shape mismatch ({elapsed_time.shape} != {robustness.shape})"
+        if len(robustness) == 0:
+            return
+        violations = robustness < 0
+        self.n_samples += len(robustness)
+        self.n_violating_samples += int(np.sum(violations))
+        self.n_episodes += 1
+        episode_min = float(np.nanmin(robustness))
+        self.min, self.max = min(self.min, episode_min), max(self.max, float(np.nanmax(robustness)))
+        self.robustness.update(robustness)
+        self.robustness_hist.update(robustness)
+        self.episode_min.update([episode_min])
+        if np.any(violations):
+            self.n_violating_episodes += 1
+            self.time_to_violation.update([elapsed_time[np.argmax(violations)] - elapsed_time[0]])
+
+    def merge(self, other: "RuleStats"):
+        self.n_samples += other.n_samples
+        self.n_violating_samples += other.n_violating_samples
+        self.n_episodes += other.n_episodes
+        self.n_violating_episodes += other.n_violating_episodes
+        self.min, self.max = min(self.min, other.min), max(self.max, other.max)
+        self.robustness.merge(other.robustness)
+        self.robustness_hist.merge(other.robustness_hist)
+        self.episode_min.merge(other.episode_min)
+        self.time_to_violation.merge(other.time_to_violation)
+
+    def summary(self, quantiles: Sequence[float] = (0.01, 0.05, 0.5, 0.95, 0.99)) -> Dict[str, Any]:
+        return {
+            "episodes": self.n_episodes,
+            "violation_rate": self.n_violating_episodes / max(self.n_episodes, 1),
+            "sample_violation_rate": self.n_violating_samples / max(self.n_samples, 1),
+            "min": self.min,
+            "max": self.max,
+            "episode_min_quantiles": {q: self.episode_min.quantile(q) for q in quantiles},
+            "time_to_violation_quantiles": {q: self.time_to_violation.quantile(q) for q in quantiles},
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"n_samples": self.n_samples, "n_violating_samples": self.n_violating_samples,
+                "n_episodes": self.n_episodes, "n_violating_episodes": self.n_violating_episodes,
+                "min": self.min, "max": self.max, "robustness": self.robustness.to_dict(),
+                "robustness_hist": self.robustness_hist.to_dict(), "episode_min": self.episode_min.to_dict(),
+                "time_to_violation": self.time_to_violation.to_dict()}
+
+    @staticmethod
+    def from_dict(d: Dict[str, Any]) -> "RuleStats":
+        stats = RuleStats()
+        stats.n_samples, stats.n_violating_samples = d["n_samples"], d["n_violating_samples"]
+        stats.n_episodes, stats.n_violating_episodes = d["n_episodes"], d["n_violating_episodes"]
+        stats.min, stats.max = d["min"], d["max"]
+        stats.robustness = QuantileSketch.from_dict(d["robustness"])
+        stats.robustness_hist = Histogram.from_dict(d["robustness_hist"])
+        stats.episode_min = QuantileSketch.from_dict(d["episode_min"])
+        stats.time_to_violation = QuantileSketch.from_dict(d["time_to_violation"])
+        return stats
+
+
+class FleetStats:
+    """
+    Fleet-level robustness statistics, one `RuleStats` for each (rule, params hash).
+
+    It can be updated as results are produced, merged across worker processes and saved as (small) json files.
+    Merged statistics count every update: files saved by runs which monitored the same input again (e.g. after it
+    has been modified) cannot simply be merged, use `update_from_store` which reads only the latest results.
+    """
+
+    def __init__(self):
+        self._stats: Dict[Tuple[str, str], RuleStats] = {}
+
+    def keys(self) -> List[Tuple[str, str]]:
+        return list(self._stats.keys())
+
+    def __getitem__(self, key: Tuple[str, str]) -> RuleStats:
+        return self._stats[key]
+
+    def update(self, rule: str, params: str, elapsed_time: np.ndarray, robustness: np.ndarray):
+        if (rule, params) not in self._stats:
+            self._stats[(rule, params)] = RuleStats()
+        self._stats[(rule, params)].update(elapsed_time, robustness)
+
+    def update_from_store(self, reader, **filters):
+        """ Consume the latest results of a `ResultsReader`, optionally filtered as in `ResultsReader.index`."""
+        for meta, elapsed_time, robustness in reader.read(**filters):
+            self.update(meta["rule"], meta["params"], elapsed_time, robustness)
+
+    def merge(self, other: "FleetStats"):
+        for key, stats in other._stats.items():
+            if key not in self._stats:
+                self._stats[key] = RuleStats()
+            self._stats[key].merge(stats)
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        return {f"{rule}:{params}": stats.summary() for (rule, params), stats in self._stats.items()}
+
+    def save(self, path: pathlib.Path):
+        with open(path, "w") as f:
+            json.dump([{"rule": rule, "params": params, "stats": stats.to_dict()}
+                       for (rule, params), stats in self._stats.items()], f)
+
+    @staticmethod
+    def load(path: pathlib.Path) -> "FleetStats":
+        fleet = FleetStats()
+        with open(path, "r") as f:
+            for entry in json.load(f):
+                fleet._stats[(entry["rule"], entry["params"])] = RuleStats.from_dict(entry["stats"])
+        return fleet
+
+    @staticmethod
+    def load_and_merge(paths: Iterable[pathlib.Path]) -> "FleetStats":
+        fleet = FleetStats()
+        for path in paths:
+            fleet.merge(FleetStats.load(path))
+        return fleet
@@ -0,0 +1,72 @@
+from typing import Any, List, Mapping, Sequence, Tuple
+
+import numpy as np
+
+from stl_rules.lazy_monitor import LazyMonitor
+from stl_rules.spec_analysis import future_horizon, past_horizon
+from stl_rules.stl_rule import STLRule
+
+
+class IncrementalMonitor:
+    """
+    Monitor of a rule on a trace which is edited in place, e.g. by a scenario perturbation loop.
+
+    After an edit of the input data in a range of steps, the generated signals are recomputed only on a window
+    around the range (widened by the rule `signals_radius`) and the robustness only on the steps whose formula
+    horizon overlaps the changed signals, reusing the memoized sub-formula values elsewhere.
+    The results are the same of a full evaluation on the edited trace.
+    """
+
+    def __init__(self, rule: STLRule, data: Mapping[str, Sequence[Any]], spec: str = None):
+        """
+        :param rule: rule to monitor, its `generate_signals` is used to produce the monitored signals
+        :param data: input trace (dict of arrays or dataframe), as passed to `generate_signals`
+        :param spec: spec to monitor, default: the rule spec
+        """
+        self._rule = rule
+        self._data = {k: np.array(data[k]) for k in data.keys()}
+        lengths = {len(v) for v in self._data.values()}
+        assert len(lengths) == 1, f"data columns must have the same length ({lengths})"
+        self._n = lengths.pop()
+        self._monitor = LazyMonitor(spec if spec is not None else rule.spec, rule.generate_signals(self._data))
+        self._robustness = self._monitor.robustness_at(range(self._n))
+
+    @property
+    def robustness(self) -> List[float]:
+        return list(self._robustness)
+
+    @property
+    def n_evaluated(self) -> int:
+        """ Number of sub-formula values computed so far (for all the evaluations)."""
+        return self._monitor.n_evaluated
+
+    def update(self, edits: Mapping[str, Sequence[Any]], begin: int) -> List[float]:
+        """
+        :param edits: new values of some data columns, from step `begin` (the trace length does not change)
+        :return: robustness of the edited trace
+        """
+        end = begin
+        for name, values in edits.items():
+            assert name in self._data, f"unknown data column {name}"
+            assert 0 <= begin and begin + len(values) <= self._n, f"edit out of trace (len {self._n})"
+            self._data[name][begin:begin + len(values)] = values
+            end = max(end, begin + len(values))
+        if end == begin:
+            return self.robustness
+        # signals in [begin - r, end + r) may change, they are computed on a window with r more samples per side
+        # to not depend on the window borders (unless they are the trace borders)
+        r = self._rule.signals_radius
+        lo, hi = max(begin - 2 * r, 0), min(end + 2 * r, self._n)
+        splice_lo, splice_hi = max(begin - r, 0), min(end + r, self._n)
+        signals = self._rule.generate_signals({k: v[lo:hi] for k, v in self._data.items()})
+        changed = self._monitor.update({k: np.asarray(v)[splice_lo - lo:splice_hi - lo] for k, v in signals.items()},
+                                       begin=splice_lo)
+        if changed != (0, 0):
+            self._robustness = self._monitor.robustness_at(range(self._n))
+        return self.robustness
+
+    def affected_range(self, begin: int, end: int) -> Tuple[int, int]:
+        """ Steps whose robustness can change after an edit of the input data in [begin, end)."""
+        r = self._rule.signals_radius
+        past, future = past_horizon(self._monitor.root), future_horizon(self._monitor.root)
+        return int(max(begin - r - future, 0)), int(min(end + r + past, self._n))
@@ -0,0 +1,237 @@
+import math
+from typing import Any, Dict, List, Mapping, Sequence, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from stl_rules.spec_analysis import Node, parse_spec, past_horizon, future_horizon
+
+
+class LazyMonitor:
+    """
+    Lazy offline monitor: robustness of an stl spec evaluated only at the requested steps.
+
+    Each sub-formula is evaluated on demand over the range of steps needed by the queries (given the temporal
+    operators in between) and its values are memoized, so queries close to each other share the computation.
+    Identical sub-formulas are parsed into the same node, then evaluated once.
+    The semantics follows the rtamt discrete-time offline interpreter (e.g. samples out of the trace count as +inf
+    for `always` and `next`, -inf for `eventually`), so the results match `monitor_trace` on the same signals.
+    """
+
+    def __init__(self, stl_spec: str, signals: Mapping[str, Sequence[Any]]):
+        """
+        :param stl_spec: specification in rtamt syntax, intervals in steps
+        :param signals: signals as passed to `monitor_trace` (including `time`), all of the same length
+        """
+        self._root = parse_spec(stl_spec)
+        self._inputs = {k: np.array(v, dtype=float) for k, v in signals.items()}
+        lengths = {len(v) for v in self._inputs.values()}
+        assert len(lengths) == 1, f"signals must have the same length ({lengths})"
+        self._n = lengths.pop()
+        self._time = list(signals["time"]) if "time" in signals else list(range(self._n))
+        # memo: node -> (values, computed mask)
+        self._memo: Dict[Node, Tuple[np.ndarray, np.ndarray]] = {}
+        self._horizons: Dict[Node, Tuple[float, float]] = {}
+        self.n_evaluated = 0
+
+    @property
+    def root(self) -> Node:
+        return self._root
+
+    def __len__(self) -> int:
+        return self._n
+
+    def robustness_at(self, indices: Sequence[int]) -> List[float]:
+        """ Robustness of the spec at the given step indices (negative indices count from the end)."""
+        indices = [i + self._n if i < 0 else i for i in indices]
+        assert all([0 <= i < self._n for i in indices]), f"indices out of trace (len {self._n})"
+        out = []
+        # contiguous runs of indices are evaluated together
+        for lo, hi in _runs(sorted(set(indices))):
+            self._eval(self._root, lo, hi)
+        values = self._memo[self._root][0] if len(indices) > 0 else None
+        for i in indices:
+            out.append(float(values[i]))
+        return out
+
+    def query(self, indices: Sequence[int]) -> List[Tuple[Any, float]]:
+        """ As `robustness_at`, in the same (time, robustness) format of `monitor_trace`."""
+        return [(self._time[i], r) for i, r in zip(indices, self.robustness_at(indices))]
+
+    def update(self, signals: Mapping[str, Sequence[Any]], begin: int) -> Tuple[int, int]:
+        """
+        Replace the values of some signals from step `begin` (the trace length does not change) and invalidate
+        the memoized values depending on them: for each sub-formula, the steps whose horizon overlaps the changed
+        samples. The following queries recompute only those, with the same results of a new monitor.
+
+        :return: range [lo, hi) of the samples which actually changed
+        """
+        lo, hi = self._n, 0
+        for name, values in signals.items():
+            assert name in self._inputs, f"unknown signal {name}"
+            values = np.asarray(values, dtype=float)
+            assert 0 <= begin and begin + len(values) <= self._n, f"update out of trace (len {self._n})"
+            changed = np.flatnonzero(self._inputs[name][begin:begin + len(values)] != values)
+            if len(changed) > 0:
+                lo, hi = min(lo, begin + int(changed[0])), max(hi, begin + int(changed[-1]) + 1)
+            self._inputs[name][begin:begin + len(values)] = values
+            if name == "time":
+                self._time[begin:begin + len(values)] = list(signals[name])
+        if hi <= lo:
+            return 0, 0
+        for node, (_, computed) in self._memo.items():
+            if node not in self._horizons:
+                self._horizons[node] = (past_horizon(node), future_horizon(node))
+            past, future = self._horizons[node]
+            # value at step i depends on samples in [i - past, i + future]
+            computed[max(lo - future, 0):min(hi + past, self._n)] = False
+        return lo, hi
+
+    def _eval(self, node: Node, lo: int, hi: int) -> np.ndarray:
+        """ Values of node in steps [lo, hi) clipped to the trace, computing only the ones not memoized."""
+        lo, hi = max(lo, 0), min(hi, self._n)
+        if hi <= lo:
+            return np.empty(0)
+        if node.op == "var":
+            assert node.value in self._inputs, f"missing signal {node.value}"
+            return self._inputs[node.value][lo:hi]
+        if node.op == "const":
+            return np.full(hi - lo, node.value)
+        if node not in self._memo:
+            self._memo[node] = (np.empty(self._n), np.zeros(self._n, dtype=bool))
+        values, computed = self._memo[node]
+        missing = np.flatnonzero(~computed[lo:hi])
+        if len(missing) > 0:
+            mlo, mhi = lo + int(missing[0]), lo + int(missing[-1]) + 1
+            values[mlo:mhi] = self._compute(node, mlo, mhi)
+            computed[mlo:mhi] = True
+            self.n_evaluated += mhi - mlo
+        return values[lo:hi]
+
+    def _padded(self, node: Node, lo: int, hi: int, fill: float) -> np.ndarray:
+        """ Values of node in steps [lo, hi), `fill` for the steps out of the trace."""
+        out = np.full(hi - lo, fill)
+        clo, chi = max(lo, 0), min(hi, self._n)
+        if chi > clo:
+            out[clo - lo:chi - lo] = self._eval(node, clo, chi)
+        return out
+
+    def _compute(self, node: Node, lo: int, hi: int) -> np.ndarray:
+        op, children = node.op, node.children
+        if op == "abs":
+            return np.abs(self._eval(children[0], lo, hi))
+        if op in ["+", "-", "*", "/", "cmp", "and", "or", "implies", "iff"]:
+            left, right = self._eval(children[0], lo, hi), self._eval(children[1], lo, hi)
+            return _binary_ops[node.value if op == "cmp" else op](left, right)
+        if op == "not":
+            return -self._eval(children[0], lo, hi)
+        if op == "next":
+            return self._padded(children[0], lo + 1, hi + 1, math.inf)
+        if op == "prev":
+            return self._padded(children[0], lo - 1, hi - 1, math.inf)
+        if node.interval is None:
+            return self._compute_unbounded(node, lo, hi)
+        a, b = node.interval
+        if op in ["always", "eventually"]:
+            fill, reduce = (math.inf, np.min) if op == "always" else (-math.inf, np.max)
+            window = self._padded(children[0], lo + a, hi + b, fill)
+            return reduce(sliding_window_view(window, b - a + 1), axis=1)
+        if op in ["historically", "once"]:
+            fill, reduce = (math.inf, np.min) if op == "historically" else (-math.inf, np.max)
+            window = self._padded(children[0], lo - b, hi - a, fill)
+            return reduce(sliding_window_view(window, b - a + 1), axis=1)
+        if op == "until":
+            # out_i = max_{t in [i+a, i+b]} min(right_t, min(left[i:t])), out of trace left=+inf, right=-inf
+            left = self._padded(children[0], lo, hi + b, math.inf)
+            right = self._padded(children[1], lo + a, hi + b, -math.inf)
+            out = np.empty(hi - lo)
+            for k in range(hi - lo):
+                left_min = np.concatenate([[math.inf], np.minimum.accumulate(left[k:k + b])])[a:b + 1]
+                out[k] = np.max(np.minimum(right[k:k + b - a + 1], left_min))
+            return out
+        if op == "since":
+            # out_i = max_{t in [i-b, i-a]} min(right_t, min(left[t+1:i+1])), out of trace left=+inf, right=-inf
+            left = self._padded(children[0], lo - b + 1, hi, math.inf)
+            right = self._padded(children[1], lo - b, hi - a, -math.inf)
+            out = np.empty(hi - lo)
+            for k in range(hi - lo):
+                # min of left in (t, i] for t = i-b, ..., i
+                left_min = np.concatenate([np.minimum.accumulate(left[k:k + b][::-1])[::-1], [math.inf]])[:b - a + 1]
+                out[k] = np.max(np.minimum(right[k:k + b - a + 1], left_min))
+            return out
+        raise ValueError(f"operator {op} not supported")
+
+    def _compute_unbounded(self, node: Node, lo: int, hi: int) -> np.ndarray:
+        # the recursion also computes the steps between the requested range and the closest memoized value (or the
+        # trace border), they are memoized as well so that the next queries do not repeat it
+        op, children = node.op, node.children
+        values, computed = self._memo[node]
+        if op in ["always", "eventually", "until"]:
+            # backward recursion from the end of the trace, or from the first memoized value after hi
+            init = {"always": math.inf, "eventually": -math.inf, "until": -math.inf}[op]
+            later = np.flatnonzero(computed[hi:])
+            end = hi + int(later[0]) if len(later) > 0 else self._n
+            tail = values[end] if end < self._n else init
+            if op in ["always", "eventually"]:
+                accumulate = np.minimum.accumulate if op == "always" else np.maximum.accumulate
+                child = np.append(self._eval(children[0], lo, end), tail)
+                out = accumulate(child[::-1])[::-1][:end - lo]
+            else:
+                left, right = self._eval(children[0], lo, end), self._eval(children[1], lo, end)
+                out = np.empty(end - lo)
+                for k in range(end - lo - 1, -1, -1):
+                    tail = max(min(left[k], tail), right[k])
+                    out[k] = tail
+            values[hi:end], computed[hi:end] = out[hi - lo:], True
+            self.n_evaluated += end - hi
+            return out[:hi - lo]
+        if op in ["historically", "once", "since"]:
+            # forward recursion from the begin of the trace, or from the last memoized value before lo
+            init = {"historically": math.inf, "once": -math.inf, "since": -math.inf}[op]
+            earlier = np.flatnonzero(computed[:lo])
+            begin = int(earlier[-1]) + 1 if len(earlier) > 0 else 0
+            head = values[begin - 1] if begin > 0 else init
+            if op in ["historically", "once"]:
+                accumulate = np.minimum.accumulate if op == "historically" else np.maximum.accumulate
+                child = np.insert(self._eval(children[0], begin, hi), 0, head)
+                out = accumulate(child)[1:]
+            else:
+                left, right = self._eval(children[0], begin, hi), self._eval(children[1], begin, hi)
+                out = np.empty(hi - begin)
+                for k in range(hi - begin):
+                    head = max(min(left[k], head), right[k])
+                    out[k] = head
+            values[begin:lo], computed[begin:lo] = out[:lo - begin], True
+            self.n_evaluated += lo - begin
+            return out[lo - begin:]
+        raise ValueError(f"operator {op} not supported")
+
+
+# robustness of binary operators, as in rtamt
+_binary_ops = {
+    "+": np.add,
+    "-": np.subtract,
+    "*": np.multiply,
+    "/": np.divide,
+    "<=": lambda l, r: r - l,
+    "<": lambda l, r: r - l,
+    ">=": lambda l, r: l - r,
+    ">": lambda l, r: l - r,
+    "==": lambda l, r: -np.abs(l - r),
+    "!==": lambda l, r: np.abs(l - r),
+    "and": np.minimum,
+    "or": np.maximum,
+    "implies": lambda l, r: np.maximum(-l, r),
+    "iff": lambda l, r: -np.abs(l - r),
+}
+
+
+def _runs(indices: List[int]) -> List[Tuple[int, int]]:
+    """ Split sorted indices in contiguous ranges [lo, hi)."""
+    runs = []
+    for i in indices:
+        if runs and runs[-1][1] == i:
+            runs[-1][1] = i + 1
+        else:
+            runs.append([i, i + 1])
+    return [(lo, hi) for lo, hi in runs]
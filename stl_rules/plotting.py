@@ -0,0 +1,138 @@
+import warnings
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+from matplotlib.axes import Axes
+from matplotlib.figure import Figure
+
+
+def lttb_downsample(x: np.ndarray, y: np.ndarray, n_out: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Largest-Triangle-Three-Buckets downsampling [Steinarsson, 2013].
+
+    Keeps the first and last sample and, for each bucket in between, the sample forming the largest triangle
+    with the previously selected point and the average of the next bucket.
+    In this way, narrow dips (e.g. short violations) survive the downsampling.
+    """
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    assert x.shape == y.shape, f"x and y must have the same shape ({x.shape} != {y.shape})"
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return x, y
+    # bucket edges for the n-2 inner points
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    out_idx = np.empty(n_out, dtype=int)
+    out_idx[0], out_idx[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # average point of next bucket (the last bucket looks at the last sample)
+        nlo, nhi = (edges[i + 1], edges[i + 2]) if i + 2 < len(edges) else (n - 1, n)
+        avg_x, avg_y = x[nlo:nhi].mean(), y[nlo:nhi].mean()
+        # triangle areas (up to constant factor) between selected point a, candidates and next-bucket avg
+        areas = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(areas))
+        out_idx[i + 1] = a
+    return x[out_idx], y[out_idx]
+
+
+def minmax_downsample(x: np.ndarray, y: np.ndarray, n_out: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Min/max bucketing: split the curve in `n_out`/2 buckets and keep, for each, the min and the max sample
+    in their original order. The result has at most `n_out` points and preserves the exact extrema.
+    """
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    assert x.shape == y.shape, f"x and y must have the same shape ({x.shape} != {y.shape})"
+    n, n_buckets = len(x), n_out // 2
+    if n_out >= n or n_buckets < 1:
+        return x, y
+    edges = np.linspace(0, n, n_buckets + 1).astype(int)
+    idx = []
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        i_min, i_max = lo + int(np.argmin(y[lo:hi])), lo + int(np.argmax(y[lo:hi]))
+        idx.extend(sorted({i_min, i_max}))
+    idx = np.asarray(idx)
+    return x[idx], y[idx]
+
+
+# map from downsampling method name to implementation, all with signature (x, y, n_out) -> (x, y)
+downsamplers = {
+    "lttb": lttb_downsample,
+    "minmax": minmax_downsample,
+}
+
+
+def bin_min(x: np.ndarray, y: np.ndarray, bin_width: float) -> np.ndarray:
+    """
+    Reduce a curve to its minimum value in each time bin [k*bin_width, (k+1)*bin_width), starting from time 0
+    (nan for empty bins). Using the minimum, rather than the mean, keeps the violation dips visible.
+    """
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    assert bin_width > 0, f"not valid bin width ({bin_width})"
+    if len(x) == 0:
+        return np.empty(0)
+    bin_ids = np.floor(x / bin_width).astype(int)
+    assert bin_ids.min() >= 0, "time must be non-negative, shift it to start from 0"
+    out = np.full(bin_ids.max() + 1, np.inf)
+    np.minimum.at(out, bin_ids, y)
+    # empty bins are told apart by their count, robustness itself can be +/-inf
+    out[np.bincount(bin_ids, minlength=len(out)) == 0] = np.nan
+    return out
+
+
+def robustness_envelope(binned: List[np.ndarray], quantiles: Sequence[float] = (0.05, 0.5, 0.95)) -> Dict[
+    str, np.ndarray]:
+    """
+    Aggregate robustness across episodes.
+
+    :param binned: per-episode binned curves on the same time grid (e.g. from `bin_min`), possibly of different len
+    :param quantiles: quantiles to compute per bin
+    :return: dict with per-bin `min`, `max` and one entry `q<quantile>` for each quantile
+    """
+    n_bins = max(len(b) for b in binned)
+    stacked = np.full((len(binned), n_bins), np.nan)
+    for i, b in enumerate(binned):
+        stacked[i, :len(b)] = b
+    # bins with no sample in any episode give all-nan columns, silence numpy warnings and leave them nan
+    with np.errstate(all="ignore"), warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        out = {"min": np.nanmin(stacked, axis=0), "max": np.nanmax(stacked, axis=0)}
+        for q, values in zip(quantiles, np.nanquantile(stacked, quantiles, axis=0)):
+            out[f"q{q}"] = values
+    return out
+
+
+def draw_robustness(ax: Axes, title: str, curves: List[Tuple[np.ndarray, np.ndarray, str]] = None,
+                    envelope: Dict[str, np.ndarray] = None, bin_centers: np.ndarray = None, max_legend: int = 10):
+    """
+    Draw robustness curves (one line per episode) and/or an aggregated envelope on the given axes.
+    The envelope is drawn as min/max band, inner-quantile band and median line.
+    """
+    ax.set_title(title)
+    ax.set_xlabel("time (sec)")
+    ax.set_ylabel("robustness")
+    if envelope is not None:
+        assert bin_centers is not None, "bin centers required to draw the envelope"
+        ax.fill_between(bin_centers, envelope["min"], envelope["max"], alpha=0.15, label="min-max")
+        qs = sorted((k for k in envelope if k.startswith("q")), key=lambda k: float(k[1:]))
+        if len(qs) >= 2:
+            ax.fill_between(bin_centers, envelope[qs[0]], envelope[qs[-1]], alpha=0.3, label=f"{qs[0]}-{qs[-1]}")
+        if len(qs) % 2 == 1:
+            ax.plot(bin_centers, envelope[qs[len(qs) // 2]], label=qs[len(qs) // 2])
+    for xx, yy, label in curves or []:
+        ax.plot(xx, yy, label=label, linewidth=0.8)
+    ax.axhline(0.0, color="k", linewidth=0.5)
+    n_labels = len(curves or []) + (3 if envelope is not None else 0)
+    if 0 < n_labels <= max_legend:
+        ax.legend()
+
+
+def render_robustness_plot(outpath: str, title: str, curves: List[Tuple[np.ndarray, np.ndarray, str]] = None,
+                           envelope: Dict[str, np.ndarray] = None, bin_centers: np.ndarray = None) -> str:
+    """
+    Render the robustness plot to file without any gui backend (safe to call from worker processes).
+    """
+    fig = Figure(figsize=(8, 5))
+    draw_robustness(fig.subplots(), title, curves=curves, envelope=envelope, bin_centers=bin_centers)
+    fig.savefig(outpath)
+    return outpath
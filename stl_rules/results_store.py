@@ -0,0 +1,196 @@
+import glob
+import hashlib
+import json
+import os
+import pathlib
+import time
+import uuid
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+import numpy as np
+
+
+def params_hash(params: Dict[str, Any]) -> str:
+    """ Short stable hash of a parameter set, used to tell apart results of the same rule with different params."""
+    return hashlib.sha1(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()[:12]
+
+
+class ResultsWriter:
+    """
+    Append-only writer of robustness results.
+
+    Results are buffered in memory and flushed in batches: each flush writes one binary segment
+    `segment_<writer>_<seq>.npy`, a float64 matrix (2 x n_samples) with `elapsed_time` and `robustness` columns of
+    all the buffered results concatenated, and appends one json line per result to the writer's own manifest
+    `manifest_<writer>.jsonl` (metadata, segment and offset of the result).
+
+    Each writer only appends to its own files, so several processes can write in the same store concurrently.
+    Segments are written to a temporary file and renamed, so readers never see partial segments.
+    """
+
+    def __init__(self, root: pathlib.Path, batch_size: int = 64, max_delay: float = None,
+                 on_flush: Callable[[List[Dict[str, Any]]], None] = None):
+        """
+        :param root: store directory
+        :param batch_size: num of results per segment
+        :param max_delay: flush a partial batch once its oldest result is buffered since `max_delay` sec
+            (checked on `append` and `flush_if_due`), default: only full batches are flushed before `close`
+        :param on_flush: callback called with the manifest entries of the results once they are in the store
+            (e.g. to record them as processed)
+        """
+        self._root = pathlib.Path(root)
+        self._root.mkdir(parents=True, exist_ok=True)
+        self._id = f"{os.getpid()}_{uuid.uuid4().hex[:8]}"
+        self._batch_size = batch_size
+        self._max_delay = max_delay
+        self._on_flush = on_flush
+        self._n_segments = 0
+        self._buffer: List[Tuple[Dict[str, Any], np.ndarray, np.ndarray]] = []
+
+    @property
+    def manifest_path(self) -> pathlib.Path:
+        return self._root / f"manifest_{self._id}.jsonl"
+
+    def append(self, elapsed_time: np.ndarray, robustness: np.ndarray, rule: str, params: str, episode: str,
+               actors: str, **metadata) -> str:
+        """
+        :param elapsed_time, robustness: result arrays, same length
+        :param rule: rule name (e.g. `safe1`)
+        :param params: hash of the rule parameters (see `params_hash`)
+        :param episode: episode identifier
+        :param actors: actor pair identifier (e.g. `3159_3162`)
+        :param metadata: any other json-serializable info (e.g. monitoring time, input `file`)
+        :return: unique id of the result in the store
+        """
+        elapsed_time = np.asarray(elapsed_time, dtype=float)
+        robustness = np.asarray(robustness, dtype=float)
+        assert elapsed_time.shape == robustness.shape, f"shape mismatch ({elapsed_time.shape} != {robustness.shape})"
+        meta = {"id": uuid.uuid4().hex, "rule": rule, "params": params, "episode": episode, "actors": actors,
+                "created": time.time(), **metadata}
+        self._buffer.append((meta, elapsed_time, robustness))
+        self.flush_if_due()
+        return meta["id"]
+
+    def flush_if_due(self):
+        """ Flush if the batch is full or its oldest result is buffered since more than `max_delay` sec."""
+        if len(self._buffer) >= self._batch_size:
+            self.flush()
+        elif self._max_delay is not None and len(self._buffer) > 0 and \
+                time.time() - self._buffer[0][0]["created"] >= self._max_delay:
+            self.flush()
+
+    def flush(self):
+        if len(self._buffer) == 0:
+            return
+        segment = f"segment_{self._id}_{self._n_segments:06d}.npy"
+        data = np.empty((2, sum(len(r) for _, _, r in self._buffer)))
+        entries, offset = [], 0
+        for meta, elapsed_time, robustness in self._buffer:
+            data[0, offset:offset + len(robustness)] = elapsed_time
+            data[1, offset:offset + len(robustness)] = robustness
+            entries.append({**meta, "segment": segment, "offset": offset, "length": len(robustness)})
+            offset += len(robustness)
+        tmp_path = self._root / f".{segment}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, data)
+        os.replace(tmp_path, self._root / segment)
+        # manifest entries are written only once the segment is in place
+        with open(self.manifest_path, "a") as f:
+            f.write("\n".join([json.dumps(entry) for entry in entries]) + "\n")
+        self._n_segments += 1
+        self._buffer = []
+        if self._on_flush is not None:
+            self._on_flush(entries)
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class ResultsReader:
+    """
+    Reader of a results store written by one or more `ResultsWriter`.
+
+    Selection is done on the manifests only, then the matching results are read from memory-mapped segments,
+    so only the selected samples are actually loaded.
+    The store can be read while writers are appending: a manifest line not terminated yet is ignored, and its
+    result shows up in the next `index` once the writer has completed it.
+    When an input `file` is monitored again (e.g. after it has been modified), the new result replaces the
+    previous ones of the same rule and params: only the latest is returned, unless `latest=False`.
+    Writers should give `file` as a resolved path, and can name the id of the result they replace in `supersedes`.
+    """
+
+    def __init__(self, root: pathlib.Path):
+        self._root = pathlib.Path(root)
+        assert self._root.exists(), f"results store {self._root} not exists"
+        self._segments: Dict[str, np.ndarray] = {}
+
+    def index(self, latest: bool = True, **filters) -> List[Dict[str, Any]]:
+        """
+        :param latest: drop the results named by the `supersedes` of another one and return only the latest result
+            for each (rule, params, file), results without `file` are always returned
+        :param filters: metadata values to match, e.g. `rule="safe1", episode="episode_1"`;
+            a list/tuple/set value matches any of its elements
+        :return: manifest entries of the matching results, in writing order for each writer
+        """
+        entries = []
+        for manifest in sorted(glob.glob(str(self._root / "manifest_*.jsonl"))):
+            entries.extend(self._manifest_entries(manifest))
+        if latest:
+            # replaced results are dropped before filtering, so that filters never select an outdated one
+            superseded = {e["supersedes"] for e in entries if "supersedes" in e}
+            entries = [e for e in entries if e.get("id") not in superseded]
+            newest: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+            for entry in entries:
+                key = (entry["rule"], entry["params"], entry.get("file"))
+                if key[2] is not None and (key not in newest or entry["created"] >= newest[key]["created"]):
+                    newest[key] = entry
+            entries = [e for e in entries if e.get("file") is None or
+                       newest[(e["rule"], e["params"], e["file"])] is e]
+        return [e for e in entries if all(self._match(e.get(k), v) for k, v in filters.items())]
+
+    def read(self, latest: bool = True, **filters) -> Iterator[Tuple[Dict[str, Any], np.ndarray, np.ndarray]]:
+        """
+        :param latest, filters: as in `index`
+        :return: iterator over (metadata, elapsed_time, robustness) of the matching results
+        """
+        for entry in self.index(latest, **filters):
+            data = self._segment(entry["segment"])
+            begin, end = entry["offset"], entry["offset"] + entry["length"]
+            yield entry, np.array(data[0, begin:end]), np.array(data[1, begin:end])
+
+    @staticmethod
+    def _manifest_entries(manifest: str) -> List[Dict[str, Any]]:
+        """ Complete entries of a manifest, a last line still being appended by a writer is ignored."""
+        with open(manifest, "r") as f:
+            lines = f.readlines()
+        entries = []
+        for i, line in enumerate(lines):
+            last = i == len(lines) - 1
+            if last and not line.endswith("\n"):
+                break
+            if not line.strip():
+                continue
+            try:
+                entries.append(json.loads(line))
+            except json.JSONDecodeError:
+                if last:
+                    break
+                raise
+        return entries
+
+    def _segment(self, name: str) -> np.ndarray:
+        if name not in self._segments:
+            self._segments[name] = np.load(self._root / name, mmap_mode="r")
+        return self._segments[name]
+
+    @staticmethod
+    def _match(value: Any, condition: Any) -> bool:
+        if isinstance(condition, (list, tuple, set)):
+            return value in condition
+        return value == condition
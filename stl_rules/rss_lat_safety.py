@@ -2,6 +2,7 @@ from typing import Dict, List
 
 import numpy as np
 
+from stl_rules.derived_signals import as_signal_graph
 from stl_rules.stl_rule import STLRule
 
 
@@ -116,15 +117,8 @@ class RSSLateralSafetyRule(STLRule):
 
     def _compute_dynamic_safe_lat_dist(self, data: Dict[str, np.ndarray], v_l_field: str="v_lat_l", v_r_field: str="v_lat_r") -> np.ndarray:
         """ Follows the Definition 3.2 in [1]"""
-        assert [f in data for f in [v_l_field, v_r_field]]
-        v_lat_l_rho = data[v_l_field] + self._p["rho"] * self._p["a_lat_maxacc"]
-        v_lat_r_rho = data[v_r_field] - self._p["rho"] * self._p["a_lat_maxacc"]
-        d_l_prebr = (data[v_l_field] + v_lat_l_rho) / 2 * self._p["rho"]
-        d_r_prebr = (data[v_r_field] + v_lat_r_rho) / 2 * self._p["rho"]
-        d_l_brake = (v_lat_l_rho ** 2) / (2 * self._p["a_lat_minbr"])
-        d_r_brake = (v_lat_r_rho ** 2) / (2 * self._p["a_lat_minbr"])
-        d_diff = d_l_prebr + d_l_brake - (d_r_prebr - d_r_brake)
-        d_min_lat = self._p["mu"] + np.maximum(d_diff, np.zeros_like(d_diff))
+        assert all([f in data for f in [v_l_field, v_r_field]])
+        d_min_lat = as_signal_graph(data).get_derived("lat_safe_dist", self._p, v_l=v_l_field, v_r=v_r_field)
         assert d_min_lat.shape == data[v_l_field].shape
         return d_min_lat
 
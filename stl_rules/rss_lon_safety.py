@@ -2,6 +2,7 @@ from typing import Dict, List
 
 import numpy as np
 
+from stl_rules.derived_signals import as_signal_graph
 from stl_rules.stl_rule import STLRule
 
 
@@ -77,15 +78,9 @@ class RSSLongitudinalSafetyRule(STLRule):
 
     def _compute_dynamic_safe_long_dist(self, data: Dict[str, np.ndarray], v_b_field: str = "v_lon_b",
                                         v_f_field: str = "v_lon_f") -> np.ndarray:
-        assert [f in data for f in [v_b_field, v_f_field]]
-        d_b_prebr = data[v_b_field] * self._p['rho'] + 1 / 2 * self._p['a_lon_maxacc'] * self._p['rho'] ** 2
-        d_b_brake_num = ((data[v_b_field] + self._p['rho'] * self._p['a_lon_maxacc']) ** 2)
-        d_b_brake_den = 2 * self._p['a_lon_minbr']
-        d_b_brake = d_b_brake_num / d_b_brake_den
-        d_f_brake = (data[v_f_field] ** 2) / (2 * self._p['a_lon_maxbr'])
-        d_diff = d_b_prebr + d_b_brake - d_f_brake
-        d_lon_min = np.maximum(d_diff, np.zeros_like(d_diff))
-        return d_lon_min
+        """ Safe distance of Def. 1 in [2], pass a `SignalGraph` as `data` to share its terms with other rules."""
+        assert all([f in data for f in [v_b_field, v_f_field]])
+        return as_signal_graph(data).get_derived("lon_safe_dist", self._p, v_b=v_b_field, v_f=v_f_field)
 
     def generate_signals(self, data: Dict[str, np.ndarray]) -> Dict[str, List]:
         # check input
@@ -0,0 +1,114 @@
+import hashlib
+import pathlib
+import sys
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, Mapping, Tuple
+
+import numpy as np
+import pandas as pd
+
+# layout of the shared block: table -> column -> (offset in bytes, num of elements, dtype)
+Layout = Dict[str, Dict[str, Tuple[int, int, str]]]
+
+_alignment = 64
+
+
+class SharedEpisode:
+    """
+    Columns of the episode logs in one `multiprocessing.shared_memory` block.
+
+    The owner process creates the block with `SharedEpisode.create` (or `from_csv`) and passes `handle` to the
+    workers, which `SharedEpisode.attach` to it and get read-only numpy views of the columns, without any copy.
+    Columns with identical content (e.g. `v_lon_ego` logged in both `legal_turn_*.csv` and `safe1_*.csv`)
+    are stored only once.
+
+    Lifetime: every process calls `close` when done with the views, the owner also calls `unlink` to release
+    the block (both are done when exiting the context manager).
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, layout: Layout, owner: bool):
+        self._shm = shm
+        self._layout = layout
+        self._owner = owner
+
+    @staticmethod
+    def create(tables: Mapping[str, Mapping[str, Any]]) -> "SharedEpisode":
+        """
+        :param tables: map from table name (e.g. the csv stem) to its columns (dict of arrays or dataframe)
+        """
+        columns, layout, blocks, offset = {}, {}, {}, 0
+        for table_name, table in tables.items():
+            layout[table_name] = {}
+            for column_name in table.keys():
+                column = np.ascontiguousarray(table[column_name])
+                assert column.dtype.kind in "biuf", f"not numeric column {table_name}/{column_name} ({column.dtype})"
+                digest = (column.dtype.str, hashlib.sha1(column.tobytes()).hexdigest())
+                if digest not in blocks:
+                    blocks[digest] = (offset, len(column), column.dtype.str)
+                    columns[digest] = column
+                    offset += -(-column.nbytes // _alignment) * _alignment
+                layout[table_name][column_name] = blocks[digest]
+        shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        for digest, column in columns.items():
+            begin, length, dtype = blocks[digest]
+            np.ndarray(length, dtype=dtype, buffer=shm.buf, offset=begin)[:] = column
+        return SharedEpisode(shm, layout, owner=True)
+
+    @staticmethod
+    def from_csv(filepaths: List[pathlib.Path]) -> "SharedEpisode":
+        """ Load the csv logs of an episode, the table names are the file stems."""
+        return SharedEpisode.create({pathlib.Path(f).stem: pd.read_csv(f) for f in filepaths})
+
+    @staticmethod
+    def attach(handle: Tuple[str, Layout]) -> "SharedEpisode":
+        """ Attach to the block created by another process, given its `handle`."""
+        name, layout = handle
+        if sys.version_info >= (3, 13):
+            shm = shared_memory.SharedMemory(name=name, track=False)
+        else:
+            # note: before py3.13, attaching registers the block to the resource tracker, which is shared with the
+            # owner only if the worker is started by it with `multiprocessing` (otherwise it unlinks the block at exit)
+            shm = shared_memory.SharedMemory(name=name)
+        return SharedEpisode(shm, layout, owner=False)
+
+    @property
+    def handle(self) -> Tuple[str, Layout]:
+        """ Picklable reference to the shared block, to pass to the worker processes."""
+        return self._shm.name, self._layout
+
+    @property
+    def tables(self) -> List[str]:
+        return list(self._layout.keys())
+
+    @property
+    def nbytes(self) -> int:
+        return self._shm.size
+
+    def table(self, name: str) -> Dict[str, np.ndarray]:
+        """ Read-only views of the columns of a table, they are valid until `close`."""
+        assert name in self._layout, f"table {name} not in shared episode ({self.tables})"
+        out = {}
+        for column_name, (offset, length, dtype) in self._layout[name].items():
+            view = np.ndarray(length, dtype=dtype, buffer=self._shm.buf, offset=offset)
+            view.flags.writeable = False
+            out[column_name] = view
+        return out
+
+    def close(self):
+        """ Release the mapping in this process, all the views returned by `table` must be deleted before."""
+        self._shm.close()
+
+    def unlink(self):
+        """ Destroy the shared block, only the owner is allowed to do it."""
+        assert self._owner, "only the process which created the shared episode can unlink it"
+        self._shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        try:
+            self.close()
+        finally:
+            if self._owner:
+                self.unlink()
@@ -0,0 +1,347 @@
+import math
+import re
+from typing import Dict, List, Optional, Set, Tuple, Union
+
+Number = Union[int, float]
+
+# operators of the supported subset of the rtamt discrete-time stl language
+ARITHMETIC_OPS = ["var", "const", "abs", "+", "-", "*", "/"]
+COMPARISON_OPS = ["<=", ">=", "<", ">", "==", "!=="]
+BOOLEAN_OPS = ["not", "and", "or", "implies", "iff"]
+FUTURE_OPS = ["next", "always", "eventually", "until"]
+PAST_OPS = ["prev", "historically", "once", "since"]
+UNARY_TEMPORAL_OPS = ["always", "eventually", "historically", "once"]
+UNBOUNDED_OPS = ["always", "eventually", "until", "historically", "once", "since"]
+
+
+class Node:
+    """
+    Node of a parsed stl formula.
+
+    :param op: operator, one of the lists above, or `cmp` for predicates
+    :param children: sub-expressions
+    :param interval: bounds (in steps) of temporal operators, None if unbounded
+    :param value: variable name for `var`, number for `const`, comparison operator for `cmp`
+    """
+
+    def __init__(self, op: str, children: Tuple["Node", ...] = (), interval: Optional[Tuple[Number, Number]] = None,
+                 value: Union[str, float, None] = None):
+        self.op = op
+        self.children = children
+        self.interval = interval
+        self.value = value
+        self._str = None
+
+    def __str__(self):
+        # canonical, fully parenthesized representation
+        if self._str is None:
+            interval = f"[{self.interval[0]}:{self.interval[1]}]" if self.interval is not None else ""
+            if self.op == "var":
+                self._str = str(self.value)
+            elif self.op == "const":
+                self._str = repr(self.value)
+            elif self.op == "abs":
+                self._str = f"abs({self.children[0]})"
+            elif self.op == "cmp":
+                self._str = f"({self.children[0]} {self.value} {self.children[1]})"
+            elif len(self.children) == 1:
+                self._str = f"({self.op}{interval} {self.children[0]})"
+            else:
+                self._str = f"({self.children[0]} {self.op}{interval} {self.children[1]})"
+        return self._str
+
+    def __repr__(self):
+        return f"Node({self})"
+
+
+_token_re = re.compile(r"\s*(?:(\d+\.?\d*(?:[eE][+-]?\d+)?|\.\d+)|([A-Za-z_][A-Za-z0-9_]*)|(<->|->|<=|>=|!==|==|[-+*/<>()\[\]:,]))")
+
+
+def _tokenize(spec: str) -> List[str]:
+    tokens, pos = [], 0
+    spec = spec.rstrip()
+    while pos < len(spec):
+        match = _token_re.match(spec, pos)
+        if match is None:
+            raise ValueError(f"unexpected character in spec at {pos}: {spec[pos:pos + 20]}")
+        tokens.append(match.group(match.lastindex))
+        pos = match.end()
+    return tokens
+
+
+class _Parser:
+    """
+    Recursive-descent parser, precedence from loosest to tightest (as in rtamt):
+        implies/iff, or, and, until/since, unary (not, next, prev, always, eventually, historically, once),
+        comparison, +/-, * and /, unary minus and abs.
+    Identical sub-formulas are parsed into the same node object.
+    """
+
+    def __init__(self, spec: str):
+        self._tokens = _tokenize(spec)
+        self._pos = 0
+        self._nodes: Dict[str, Node] = {}
+
+    def parse(self) -> Node:
+        node = self._binary(0)
+        if self._pos != len(self._tokens):
+            raise ValueError(f"unexpected token `{self._tokens[self._pos]}` at position {self._pos}")
+        self._check_formula(node)
+        return node
+
+    _binary_levels = [{"->": "implies", "<->": "iff", "implies": "implies", "iff": "iff"},
+                      {"or": "or"}, {"and": "and"}, {"until": "until", "since": "since"}]
+
+    def _peek(self) -> Optional[str]:
+        return self._tokens[self._pos] if self._pos < len(self._tokens) else None
+
+    def _take(self, expected: str = None) -> str:
+        token = self._peek()
+        if token is None or (expected is not None and token != expected):
+            raise ValueError(f"expected `{expected}` at position {self._pos}, found `{token}`")
+        self._pos += 1
+        return token
+
+    def _make(self, op: str, children: Tuple[Node, ...] = (), interval=None, value=None) -> Node:
+        node = Node(op, children, interval, value)
+        return self._nodes.setdefault(str(node), node)
+
+    def _interval(self) -> Optional[Tuple[Number, Number]]:
+        if self._peek() != "[":
+            return None
+        self._take("[")
+        begin = self._number()
+        if self._peek() == ",":
+            self._take(",")
+        else:
+            self._take(":")
+        end = self._number()
+        self._take("]")
+        assert 0 <= begin <= end, f"not valid interval [{begin}:{end}]"
+        return begin, end
+
+    def _number(self) -> Number:
+        token = self._take()
+        value = float(token)
+        return int(value) if value.is_integer() else value
+
+    def _binary(self, level: int) -> Node:
+        if level == len(self._binary_levels):
+            return self._unary()
+        node = self._binary(level + 1)
+        while self._peek() in self._binary_levels[level]:
+            op = self._binary_levels[level][self._take()]
+            interval = self._interval() if op in ["until", "since"] else None
+            node = self._make(op, (node, self._binary(level + 1)), interval)
+        return node
+
+    def _unary(self) -> Node:
+        token = self._peek()
+        if token in ["not", "next", "prev"]:
+            self._take()
+            return self._make(token, (self._unary(),))
+        if token in UNARY_TEMPORAL_OPS:
+            self._take()
+            interval = self._interval()
+            return self._make(token, (self._unary(),), interval)
+        return self._comparison()
+
+    def _comparison(self) -> Node:
+        node = self._additive()
+        if self._peek() in COMPARISON_OPS:
+            op = self._take()
+            node = self._make("cmp", (node, self._additive()), value=op)
+        return node
+
+    def _additive(self) -> Node:
+        node = self._multiplicative()
+        while self._peek() in ["+", "-"]:
+            op = self._take()
+            node = self._make(op, (node, self._multiplicative()))
+        return node
+
+    def _multiplicative(self) -> Node:
+        node = self._atom()
+        while self._peek() in ["*", "/"]:
+            op = self._take()
+            node = self._make(op, (node, self._atom()))
+        return node
+
+    def _atom(self) -> Node:
+        token = self._peek()
+        if token == "(":
+            self._take("(")
+            node = self._binary(0)
+            self._take(")")
+            return node
+        if token == "-":
+            self._take("-")
+            node = self._atom()
+            if node.op == "const":
+                return self._make("const", value=-node.value)
+            return self._make("-", (self._make("const", value=0.0), node))
+        if token == "abs":
+            self._take("abs")
+            self._take("(")
+            node = self._additive()
+            self._take(")")
+            return self._make("abs", (node,))
+        if token is not None and re.fullmatch(r"\d+\.?\d*(?:[eE][+-]?\d+)?|\.\d+", token):
+            return self._make("const", value=float(self._take()))
+        if token is not None and re.fullmatch(r"[A-Za-z_][A-Za-z0-9_]*", token):
+            return self._make("var", value=self._take())
+        raise ValueError(f"unexpected token `{token}` at position {self._pos}")
+
+    def _check_formula(self, node: Node, formula: bool = True):
+        """ Check that boolean/temporal operators apply to formulas and comparisons to arithmetic expressions."""
+        is_arithmetic = node.op in ARITHMETIC_OPS
+        if formula and is_arithmetic:
+            raise ValueError(f"expected a formula, found arithmetic expression {node}")
+        if not formula and not is_arithmetic:
+            raise ValueError(f"expected an arithmetic expression, found formula {node}")
+        for child in node.children:
+            self._check_formula(child, formula=not is_arithmetic and node.op != "cmp")
+
+
+def parse_spec(spec: str) -> Node:
+    """ Parse an stl specification (rtamt syntax, discrete time) into its syntax tree."""
+    return _Parser(spec).parse()
+
+
+def future_horizon(node: Node) -> Number:
+    """ Number of future steps the formula value at step i depends on (math.inf if unbounded)."""
+    if node.op in ARITHMETIC_OPS or node.op == "cmp":
+        return 0
+    child_horizon = max(future_horizon(c) for c in node.children)
+    if node.op == "next":
+        return child_horizon + 1
+    if node.op in ["always", "eventually", "until"]:
+        return math.inf if node.interval is None else node.interval[1] + child_horizon
+    return child_horizon
+
+
+def past_horizon(node: Node) -> Number:
+    """ Number of past steps the formula value at step i depends on (math.inf if unbounded)."""
+    if node.op in ARITHMETIC_OPS or node.op == "cmp":
+        return 0
+    child_horizon = max(past_horizon(c) for c in node.children)
+    if node.op == "prev":
+        return child_horizon + 1
+    if node.op in ["historically", "once", "since"]:
+        return math.inf if node.interval is None else node.interval[1] + child_horizon
+    return child_horizon
+
+
+def _window(node: Node, past: bool) -> int:
+    """
+    As `past_horizon` (or `future_horizon`), but unbounded operators count as a single value: an online monitor
+    keeps their running aggregate, and their sub-formula is evaluated on its own window.
+    """
+    if node.op in ARITHMETIC_OPS or node.op == "cmp" or (node.op in UNBOUNDED_OPS and node.interval is None):
+        return 0
+    child_window = max(_window(c, past) for c in node.children)
+    if node.op == ("prev" if past else "next"):
+        return child_window + 1
+    if node.op in (["historically", "once", "since"] if past else ["always", "eventually", "until"]):
+        return node.interval[1] + child_window
+    return child_window
+
+
+def window_size(node: Node) -> int:
+    """
+    Widest window of consecutive samples needed by the bounded part of the formula, i.e. the formula itself and
+    the sub-formulas of its unbounded operators, which keep running aggregates instead of windows.
+    """
+    size = _window(node, past=True) + _window(node, past=False) + 1
+    return max([size] + [window_size(c) for n in subformulas(node) if n.op in UNBOUNDED_OPS and n.interval is None
+                         for c in n.children])
+
+
+def operator_buffer(node: Node) -> int:
+    """
+    Values of its operands an online monitor keeps for the node: the last b+1 of each operand for bounded
+    temporal operators, one for `next`/`prev` and for unbounded operators (running aggregate), none otherwise.
+    """
+    if node.op in ["next", "prev"] or (node.op in UNBOUNDED_OPS and node.interval is None):
+        return 1
+    if node.op in FUTURE_OPS + PAST_OPS:
+        return len(node.children) * (node.interval[1] + 1)
+    return 0
+
+
+def subformulas(node: Node) -> Set[Node]:
+    """ Distinct sub-formulas of the formula (including itself)."""
+    return {node}.union(*[subformulas(c) for c in node.children])
+
+
+def node_cost(node: Node, trace_len: int) -> Number:
+    """
+    Estimated number of elementary operations to evaluate the node (without its children) on a trace,
+    modelled on the rtamt discrete-time offline interpreter:
+        - bounded until/since loop over (b-a+1) candidate steps and, for each, over the left operand up to b,
+        - bounded always/eventually/historically/once loop over the (b-a+1) steps of the window,
+        - all the other operators are linear in the trace length.
+    """
+    if node.interval is not None:
+        a, b = node.interval
+        if node.op in ["until", "since"]:
+            return trace_len * (b - a + 1) * ((a + b) / 2 + 1)
+        return trace_len * (b - a + 1)
+    return trace_len
+
+
+def estimated_cost(node: Node, trace_len: int) -> Number:
+    """ Estimated evaluation cost of the whole formula (shared sub-formulas are counted once per occurrence)."""
+    return node_cost(node, trace_len) + sum(estimated_cost(c, trace_len) for c in node.children)
+
+
+def variables(node: Node) -> Set[str]:
+    if node.op == "var":
+        return {node.value}
+    return set().union(*[variables(c) for c in node.children])
+
+
+class SpecAnalysis:
+    """
+    Static analysis of an stl specification: temporal horizons, buffer size and cost model.
+
+    Horizons are in steps (i.e. samples of the discrete-time trace), the robustness at step i depends only on
+    samples in [i - past_horizon, i + future_horizon] (unbounded if the formula has unbounded operators).
+    Buffer sizes instead assume an online monitor keeping a running aggregate for the unbounded operators
+    (e.g. `always` at the root of the rules), so they are finite for any formula.
+    """
+
+    def __init__(self, spec: str):
+        self._root = parse_spec(spec)
+        self._past = past_horizon(self._root)
+        self._future = future_horizon(self._root)
+
+    @property
+    def root(self) -> Node:
+        return self._root
+
+    @property
+    def past_horizon(self) -> Number:
+        return self._past
+
+    @property
+    def future_horizon(self) -> Number:
+        return self._future
+
+    @property
+    def buffer_size(self) -> int:
+        """ Widest window of consecutive input samples needed at one step (see `window_size`)."""
+        return window_size(self._root)
+
+    @property
+    def history_size(self) -> int:
+        """ Number of values an online monitor must keep, summed over the operators (see `operator_buffer`)."""
+        return sum(operator_buffer(n) for n in subformulas(self._root))
+
+    @property
+    def variables(self) -> Set[str]:
+        return variables(self._root)
+
+    def estimated_cost(self, trace_len: int) -> Number:
+        """ Estimated number of elementary operations to evaluate the robustness of a trace of `trace_len` steps."""
+        return estimated_cost(self._root, trace_len)
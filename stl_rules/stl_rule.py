@@ -1,7 +1,10 @@
 from abc import ABC, abstractmethod
-from typing import Dict
+from typing import Any, Dict, List
 import numpy as np
 
+from stl_rules.lazy_monitor import LazyMonitor
+from stl_rules.spec_analysis import SpecAnalysis
+
 
 class STLRule(ABC):
     @property
@@ -22,3 +25,22 @@ class STLRule(ABC):
     @abstractmethod
     def generate_signals(self, data: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
         pass
+
+    @property
+    def signals_radius(self) -> int:
+        """ Number of neighbouring samples (on each side) a sample of the generated signals depends on."""
+        return 0
+
+    @property
+    def params(self) -> Dict[str, Any]:
+        """ Static parameters used by the rule (subset of rss params)."""
+        return dict(self._p)
+
+    @property
+    def analysis(self) -> SpecAnalysis:
+        """ Static analysis of `spec`: temporal horizons (in steps), buffer size and cost model."""
+        return SpecAnalysis(self.spec)
+
+    def lazy_monitor(self, signals: Dict[str, List], spec: str = None) -> LazyMonitor:
+        """ Monitor of `spec` (default: the rule spec) on the generated signals, to query the robustness at few steps."""
+        return LazyMonitor(spec if spec is not None else self.spec, signals)
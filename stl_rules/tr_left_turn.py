@@ -2,6 +2,7 @@ from typing import Dict, List
 
 import numpy as np
 
+from stl_rules.derived_signals import as_signal_graph
 from stl_rules.stl_rule import STLRule
 
 
@@ -102,13 +103,7 @@ class TrafficRuleLeftTurn(STLRule):
     def _compute_dynamic_safe_long_dist_to_junction(self, data: Dict[str, np.ndarray], v_field: str) -> np.ndarray:
         # note: the only change is the assumption that v_front = 0, because a junction is stationary
         # then, we just remove the `d_f_brake` term from the calculation
-        d_b_prebr = data[v_field] * self._p['rho'] + 1 / 2 * self._p['a_lon_maxacc'] * self._p['rho'] ** 2
-        d_b_brake_num = ((data[v_field] + self._p['rho'] * self._p['a_lon_maxacc']) ** 2)
-        d_b_brake_den = 2 * self._p['a_lon_minbr']
-        d_b_brake = d_b_brake_num / d_b_brake_den
-        d_diff = d_b_prebr + d_b_brake
-        d_lon_min = np.maximum(d_diff, np.zeros_like(d_diff))
-        return d_lon_min
+        return as_signal_graph(data).get_derived("lon_safe_dist_static", self._p, v=v_field)
 
     def generate_signals_for_demo(self, data: Dict[str, np.ndarray], begin:int=5, end:int=1000) -> Dict[str, List]:
         # check input
@@ -2,6 +2,8 @@ from typing import List, Dict, Any
 
 import rtamt
 
+from stl_rules.lazy_monitor import LazyMonitor
+
 
 def monitor_trace(stl_spec: str, vars: List[str], types: List[str], trace: Dict[str, Any]):
     spec = rtamt.STLSpecification()
@@ -16,3 +18,8 @@ def monitor_trace(stl_spec: str, vars: List[str], types: List[str], trace: Dict[
     # preprocess format, evaluate, post process
     robustness_trace = spec.evaluate(trace)
     return robustness_trace
+
+
+def query_trace(stl_spec: str, trace: Dict[str, Any], indices: List[int]):
+    """ Robustness at the given steps only, in the same (time, robustness) format of `monitor_trace`."""
+    return LazyMonitor(stl_spec, trace).query(indices)